@@ -1,26 +1,160 @@
 # Copyright (c) 2019 Eric Steinberger 2020 Vsevolod Kompantsev
 
 
+import hashlib
+import os
+from os.path import join as ospj
+
 import numpy as np
+from numba import njit
 from scipy.special import comb
-import itertools
-import time
 
 from PokerRL.game.Poker import Poker
+from PokerRL.util import file_util
 from PokerRL.game.PokerRange import PokerRange
 from PokerRL.game._.cpp_wrappers.CppLUT import CppLibHoldemLuts
 
 
+@njit(cache=True)
+def _plo_hole_cards_2_idx(c1, c2, c3, c4, range_size, binom_lut):
+    """
+    Lexicographic rank of a sorted 4-card hand, i.e. its index in itertools.combinations order.
+
+    Args:
+        c1, c2, c3, c4 (int):   1d cards, c1 < c2 < c3 < c4
+        range_size (int):       number of possible hands
+        binom_lut (np.ndarray): see _LutGetterPLO.get_hole_card_2_idx_LUT
+
+    Returns:
+        int: range_idx of the hand
+    """
+    return range_size - 1 - binom_lut[c1, 0] - binom_lut[c2, 1] - binom_lut[c3, 2] - binom_lut[c4, 3]
+
+
+@njit(cache=True)
+def _fill_plo_idx_2_hole_card(n_cards, out):
+    """
+    Fills out[range_idx] with the sorted 4 cards of every hand, in itertools.combinations order.
+    """
+    n = 0
+    for i1 in range(n_cards):
+        for i2 in range(i1 + 1, n_cards):
+            for i3 in range(i2 + 1, n_cards):
+                for i4 in range(i3 + 1, n_cards):
+                    out[n, 0] = i1
+                    out[n, 1] = i2
+                    out[n, 2] = i3
+                    out[n, 3] = i4
+                    n += 1
+
+
+@njit(cache=True)
+def _plo_range_idx(hole_cards_2d, lut_2d_2_1d, range_size, binom_lut):
+    """
+    Args:
+        hole_cards_2d (np.ndarray): [[rank, suit], ...] of the 4 hole cards in any order
+        lut_2d_2_1d (np.ndarray):   [rank, suit] -> 1d card
+        range_size (int):           number of possible hands
+        binom_lut (np.ndarray):     see _LutGetterPLO.get_hole_card_2_idx_LUT
+
+    Returns:
+        int: range_idx of the hand
+    """
+    # numba doesn't check bounds, so wrong shapes, undealt or otherwise invalid cards have to be caught here
+    if hole_cards_2d.shape[0] != 4 or hole_cards_2d.shape[1] < 2:
+        raise ValueError("hole_cards_2d has to be of shape [4, 2]")
+    for i in range(4):
+        if not (0 <= hole_cards_2d[i, 0] < lut_2d_2_1d.shape[0] and 0 <= hole_cards_2d[i, 1] < lut_2d_2_1d.shape[1]):
+            raise ValueError("hole card out of range")
+
+    c1 = lut_2d_2_1d[hole_cards_2d[0, 0], hole_cards_2d[0, 1]]
+    c2 = lut_2d_2_1d[hole_cards_2d[1, 0], hole_cards_2d[1, 1]]
+    c3 = lut_2d_2_1d[hole_cards_2d[2, 0], hole_cards_2d[2, 1]]
+    c4 = lut_2d_2_1d[hole_cards_2d[3, 0], hole_cards_2d[3, 1]]
+
+    # sorting network for 4 elements
+    if c1 > c2:
+        c1, c2 = c2, c1
+    if c3 > c4:
+        c3, c4 = c4, c3
+    if c1 > c3:
+        c1, c3 = c3, c1
+    if c2 > c4:
+        c2, c4 = c4, c2
+    if c2 > c3:
+        c2, c3 = c3, c2
+
+    if not (c1 < c2 < c3 < c4):
+        raise ValueError("duplicate hole cards")
+
+    return _plo_hole_cards_2_idx(c1, c2, c3, c4, range_size, binom_lut)
+
+
+@njit(cache=True)
+def _fill_card_in_what_range_idxs(range_idx_to_hc, out):
+    """
+    Counting sort of all range idxs by the cards they contain; range idxs stay ascending for each card.
+
+    Args:
+        range_idx_to_hc (np.ndarray):   [range_idx, c_id] -> 1d card
+        out (np.ndarray):               [card, i] -> i-th range idx that contains card. filled in place.
+    """
+    next_slot = np.zeros(out.shape[0], dtype=np.int64)
+    for range_idx in range(range_idx_to_hc.shape[0]):
+        for c_id in range(range_idx_to_hc.shape[1]):
+            c = range_idx_to_hc[range_idx, c_id]
+            out[c, next_slot[c]] = range_idx
+            next_slot[c] += 1
+
+
+# (N_HOLE_CARDS, N_RANKS, N_SUITS) --> jitted kernel, see _get_priv_obs_kernel
+_PRIV_OBS_KERNELS = {}
+
+
+def _get_priv_obs_kernel(N_HOLE_CARDS, N_RANKS, N_SUITS):
+    """
+    Returns a jitted kernel that sets the rank (and if set_suits, suit) bit of every hole card of every hand
+    in a zeroed out private obs LUT. The shape constants are closed over, so numba compiles them in as constants
+    and fully unrolls the per card loop. One kernel per shape is created and reused.
+
+    Kernel Args:
+        range_idx_to_hc (np.ndarray):   [range_idx, c_id] -> 1d card
+        hc_1d_to_2d (np.ndarray):       [1d card] -> [rank, suit]
+        set_suits (bool):               whether to set suit bits
+        out (np.ndarray):               LUT of shape [RANGE_SIZE, D * N_HOLE_CARDS]. filled in place.
+    """
+    key = (N_HOLE_CARDS, N_RANKS, N_SUITS)
+    if key not in _PRIV_OBS_KERNELS:
+        D = N_RANKS + N_SUITS
+
+        @njit(fastmath=True, boundscheck=False, cache=True)
+        def _fill_priv_obs(range_idx_to_hc, hc_1d_to_2d, set_suits, out):
+            for range_idx in range(range_idx_to_hc.shape[0]):
+                for c_id in range(N_HOLE_CARDS):
+                    card = range_idx_to_hc[range_idx, c_id]
+                    out[range_idx, D * c_id + hc_1d_to_2d[card, 0]] = 1
+                    if set_suits:
+                        out[range_idx, D * c_id + N_RANKS + hc_1d_to_2d[card, 1]] = 1
+
+        _PRIV_OBS_KERNELS[key] = _fill_priv_obs
+    return _PRIV_OBS_KERNELS[key]
+
+
 class _LutGetterBase:
 
     def __init__(self, rules):
         self.rules = rules
 
     def get_1d_card_2_2d_card_LUT(self):
-        raise NotImplementedError
+        # 1d card = rank * N_SUITS + suit in all games, also in the C++ lib used for Holdem and PLO
+        cards_1d = np.arange(self.rules.N_CARDS_IN_DECK, dtype=np.int8)
+        lut = np.stack([cards_1d // self.rules.N_SUITS, cards_1d % self.rules.N_SUITS], axis=1)
+        return lut
 
     def get_2d_card_2_1d_card_LUT(self):
-        raise NotImplementedError
+        lut = np.arange(self.rules.N_RANKS, dtype=np.int8)[:, None] * self.rules.N_SUITS \
+              + np.arange(self.rules.N_SUITS, dtype=np.int8)[None, :]
+        return lut
 
     def get_idx_2_hole_card_LUT(self):
         raise NotImplementedError
@@ -29,7 +163,20 @@ class _LutGetterBase:
         raise NotImplementedError
 
     def get_card_in_what_range_idxs_LUT(self):
-        raise NotImplementedError
+        # [c] --> all range idxs that contain c, used to zero out blocked hands in PokerRange.
+        # Each card is in the same number of hands (51 in Holdem, 20825 in PLO), so we can bucket all hands
+        # by card in a single pass over them.
+        _idx2hc_lut = self.get_idx_2_hole_card_LUT()
+        n_per_card = self.rules.RANGE_SIZE * self.rules.N_HOLE_CARDS // self.rules.N_CARDS_IN_DECK
+
+        # the kernel doesn't check bounds, so this must not be an assert that python -O strips
+        if _idx2hc_lut.min() < 0 or _idx2hc_lut.max() >= self.rules.N_CARDS_IN_DECK \
+                or np.any(np.bincount(_idx2hc_lut.ravel(), minlength=self.rules.N_CARDS_IN_DECK) != n_per_card):
+            raise ValueError("LUT_IDX_2_HOLE_CARDS has invalid cards or not every card is in the same number of hands")
+
+        lut = np.empty(shape=(self.rules.N_CARDS_IN_DECK, n_per_card), dtype=np.int32)
+        _fill_card_in_what_range_idxs(_idx2hc_lut, lut)
+        return lut
 
     def get_range_idx_to_private_obs_LUT(self, preflop_suit_bucketing=False):
         range_idx_to_hc_lut = self.get_idx_2_hole_card_LUT()
@@ -37,26 +184,48 @@ class _LutGetterBase:
 
         D = self.rules.N_SUITS + self.rules.N_RANKS
 
-        lut = np.zeros(shape=(self.rules.RANGE_SIZE, D * self.rules.N_HOLE_CARDS), dtype=np.float32)
+        # values are only 0 or 1; consumers that need floats cast on their side
+        lut = np.zeros(shape=(self.rules.RANGE_SIZE, D * self.rules.N_HOLE_CARDS), dtype=np.uint8)
 
-        for range_idx in range(self.rules.RANGE_SIZE):
-            priv_o = np.zeros(shape=self.rules.N_HOLE_CARDS * D, dtype=np.float32)
+        # If the suit doesn't matter, it is not included with the observation.
+        # With preflop_suit_bucketing we bucket hands by suits by not setting the suit bit at all.
+        _fill_priv_obs = _get_priv_obs_kernel(self.rules.N_HOLE_CARDS, self.rules.N_RANKS, self.rules.N_SUITS)
+        _fill_priv_obs(range_idx_to_hc_lut, hc_1d_to_2d_lut, self.rules.SUITS_MATTER and not preflop_suit_bucketing,
+                       lut)
 
-            for c_id in range(self.rules.N_HOLE_CARDS):
-                card = hc_1d_to_2d_lut[range_idx_to_hc_lut[range_idx, c_id]]
-                priv_o[D * c_id + card[0]] = 1
+        return lut
 
-                # If the suit doesn't matter, it is not included with the observation.
-                if self.rules.SUITS_MATTER:
-                    if not preflop_suit_bucketing:
-                        priv_o[D * c_id + self.rules.N_RANKS + card[1]] = 1
-                    else:
-                        # here we bucket hands by suits but not setting suit bit at all - do nothing
-                        pass
+    def get_range_idx_to_private_obs_LUTs(self):
+        """
+        Returns:
+            tuple: (private obs LUT, preflop suit bucketed private obs LUT). The latter only lacks the suit bits,
+            so it is derived from the former instead of being built from the hole card LUTs a second time.
+        """
+        lut = self.get_range_idx_to_private_obs_LUT()
 
-            lut[range_idx] = priv_o
+        D = self.rules.N_SUITS + self.rules.N_RANKS
+        lut_pf = np.copy(lut)
+        lut_pf.reshape(self.rules.RANGE_SIZE, self.rules.N_HOLE_CARDS, D)[:, :, self.rules.N_RANKS:] = 0
 
-        return lut
+        return lut, lut_pf
+
+    def get_array_lut_specs(self):
+        """
+        Returns:
+            dict: name --> (shape, dtype) of every array LUT that a _LutHolderBase builds with this getter. LUTs
+            loaded from the disk cache are checked against these.
+        """
+        D = self.rules.N_SUITS + self.rules.N_RANKS
+        n_per_card = self.rules.RANGE_SIZE * self.rules.N_HOLE_CARDS // self.rules.N_CARDS_IN_DECK
+        return {
+            "LUT_1DCARD_2_2DCARD": ((self.rules.N_CARDS_IN_DECK, 2), np.int8),
+            "LUT_2DCARD_2_1DCARD": ((self.rules.N_RANKS, self.rules.N_SUITS), np.int8),
+            "LUT_RANGE_IDX_TO_PRIVATE_OBS": ((self.rules.RANGE_SIZE, D * self.rules.N_HOLE_CARDS), np.uint8),
+            "LUT_RANGE_IDX_TO_PRIVATE_OBS_PF": ((self.rules.RANGE_SIZE, D * self.rules.N_HOLE_CARDS), np.uint8),
+            "LUT_IDX_2_HOLE_CARDS": ((self.rules.RANGE_SIZE, self.rules.N_HOLE_CARDS), np.int8),
+            "LUT_HOLE_CARDS_2_IDX": None,  # game specific
+            "LUT_CARD_IN_WHAT_RANGE_IDXS": ((self.rules.N_CARDS_IN_DECK, n_per_card), np.int32),
+        }
 
     def get_n_boards_LUT(self):
         _c = self.get_n_cards_dealt_in_transition_to_LUT()
@@ -105,39 +274,16 @@ class _LutGetterHoldem(_LutGetterBase):
         self.cpp_backend = CppLibHoldemLuts(n_boards_lut=self.get_n_boards_LUT(),
                                             n_cards_out_lut=self.get_n_cards_out_at_LUT())
 
-    def get_1d_card_2_2d_card_LUT(self):
-        lut = np.full(shape=(self.rules.N_CARDS_IN_DECK, 2), fill_value=-2, dtype=np.int8)
-        for c in range(self.rules.N_CARDS_IN_DECK):
-            lut[c] = self.cpp_backend.get_2d_card(c)
-        return lut
-
-    def get_2d_card_2_1d_card_LUT(self):
-        lut = np.full(shape=(self.rules.N_RANKS, self.rules.N_SUITS), fill_value=-2, dtype=np.int8)
-        for r in range(self.rules.N_RANKS):
-            for s in range(self.rules.N_SUITS):
-                lut[r, s] = self.cpp_backend.get_1d_card(card_2d=np.array([r, s], dtype=np.int8))
-        return lut
-
     def get_idx_2_hole_card_LUT(self):
         return self.cpp_backend.get_idx_2_hole_card_lut()
 
     def get_hole_card_2_idx_LUT(self):
         return self.cpp_backend.get_hole_card_2_idx_lut()
 
-    def get_card_in_what_range_idxs_LUT(self):
-        lut = np.full(shape=(self.rules.N_CARDS_IN_DECK, self.rules.N_CARDS_IN_DECK - 1), fill_value=-2,
-                      dtype=np.int32)
-
-        _idx2hc_lut = self.get_idx_2_hole_card_LUT()
-        for c in range(self.rules.N_CARDS_IN_DECK):
-            n = 0
-            for range_idx in range(self.rules.RANGE_SIZE):
-                if c in _idx2hc_lut[range_idx]:
-                    lut[c, n] = range_idx
-                    n += 1
-
-        assert not np.any(lut == -2)
-        return lut
+    def get_array_lut_specs(self):
+        specs = super().get_array_lut_specs()
+        specs["LUT_HOLE_CARDS_2_IDX"] = ((self.rules.N_CARDS_IN_DECK, self.rules.N_CARDS_IN_DECK), np.int16)
+        return specs
 
 
 class _LutGetterLeduc(_LutGetterBase):
@@ -145,20 +291,6 @@ class _LutGetterLeduc(_LutGetterBase):
     def __init__(self, env_cls):
         super().__init__(rules=env_cls.RULES)
 
-    def get_1d_card_2_2d_card_LUT(self):
-        lut = np.full(shape=(self.rules.N_CARDS_IN_DECK, 2), fill_value=-2, dtype=np.int8)
-        for c in range(self.rules.N_CARDS_IN_DECK):
-            lut[c] = self._get_2d_card(c)
-        return lut
-
-    def get_2d_card_2_1d_card_LUT(self):
-        lut = np.full(shape=(self.rules.N_RANKS, self.rules.N_SUITS),
-                      fill_value=-2, dtype=np.int8)
-        for r in range(self.rules.N_RANKS):
-            for s in range(self.rules.N_SUITS):
-                lut[r, s] = self._get_1d_card(card_2d=np.array([r, s], dtype=np.int8))
-        return lut
-
     def get_idx_2_hole_card_LUT(self):
         # int between 0 and n_cards * (n_cards-1) inclusive --> [c1]
         return np.expand_dims(np.arange(self.rules.N_CARDS_IN_DECK), axis=1)
@@ -170,28 +302,13 @@ class _LutGetterLeduc(_LutGetterBase):
     def get_card_in_what_range_idxs_LUT(self):
         return np.arange(self.rules.RANGE_SIZE).reshape(-1, 1)  # 1-card games are easy
 
-    def _get_1d_card(self, card_2d):
-        """
-        Args:
-            card_2d (np.ndarray):    array of 2 int8s. [rank, suit]
-
-        Returns:
-            int8: 1d representation of card_2d
-        """
-        return card_2d[0] * self.rules.N_SUITS + card_2d[1]
-
-    def _get_2d_card(self, card_1d):
-        """
-        Args:
-            card_1d (int):
-
-        Returns:
-            np.ndarray(shape=2, dtype=np.int8): 2d representation of card_1d
-        """
-        card_2d = np.empty(shape=2, dtype=np.int8)
-        card_2d[0] = card_1d // self.rules.N_SUITS
-        card_2d[1] = card_1d % self.rules.N_SUITS
-        return card_2d
+    def get_array_lut_specs(self):
+        specs = super().get_array_lut_specs()
+        # np.arange's default int
+        specs["LUT_IDX_2_HOLE_CARDS"] = ((self.rules.N_CARDS_IN_DECK, 1), np.int_)
+        specs["LUT_HOLE_CARDS_2_IDX"] = ((self.rules.N_CARDS_IN_DECK, 1), np.int_)
+        specs["LUT_CARD_IN_WHAT_RANGE_IDXS"] = ((self.rules.RANGE_SIZE, 1), np.int_)
+        return specs
 
 
 class _LutGetterPLO(_LutGetterBase):
@@ -201,112 +318,47 @@ class _LutGetterPLO(_LutGetterBase):
         self.cpp_backend = CppLibHoldemLuts(n_boards_lut=self.get_n_boards_LUT(),
                                             n_cards_out_lut=self.get_n_cards_out_at_LUT())
 
-    def get_range_idx_to_private_obs_LUT(self, preflop_suit_bucketing=False):
-        """
-        slow version, moved 1d to 2d translation out of cycle,
-        unrolled 4-cards loop, no check for SUITS_MATTER cuz its PLO, they DO matter.
-        changed from 12 to 5.3 sec, still slow, should be modified with fromiter and generator feeding
-        or numba JIT transform
-        """
-
-        range_idx_to_hc_lut = self.get_idx_2_hole_card_LUT()
-        hc_1d_to_2d_lut = self.get_1d_card_2_2d_card_LUT()
-
-        start = time.process_time()
-        D = self.rules.N_SUITS + self.rules.N_RANKS
-
-        lut = np.empty(shape=(self.rules.RANGE_SIZE, D * self.rules.N_HOLE_CARDS), dtype=np.int8)
-
-        # convert array of 1d hands to array of 2d hands
-        d2_range_lut = hc_1d_to_2d_lut[range_idx_to_hc_lut]
-
-        if not preflop_suit_bucketing:
-            for range_idx, element in enumerate(d2_range_lut):
-                priv_o = np.empty(shape=self.rules.N_HOLE_CARDS * D, dtype=np.int8)
-                priv_o[D * 0 + element[0, 0]] = 1
-                priv_o[D * 0 + self.rules.N_RANKS + element[0, 1]] = 1
-                priv_o[D * 1 + element[1, 0]] = 1
-                priv_o[D * 1 + self.rules.N_RANKS + element[1, 1]] = 1
-                priv_o[D * 2 + element[2, 0]] = 1
-                priv_o[D * 2 + self.rules.N_RANKS + element[2, 1]] = 1
-                priv_o[D * 3 + element[3, 0]] = 1
-                priv_o[D * 3 + self.rules.N_RANKS + element[3, 1]] = 1
-
-                lut[range_idx] = priv_o
-        else:
-
-            # for a preflop table we bucket hands, not setting any suit at all so no suit difference
-            for range_idx, element in enumerate(d2_range_lut[:, ]):
-                priv_o = np.empty(shape=self.rules.N_HOLE_CARDS * D, dtype=np.int8)
-                priv_o[D * 0 + element[0, 0]] = 1
-                # priv_o[D * 0 + self.rules.N_RANKS + element[0,1]] = 1
-                priv_o[D * 1 + element[1, 0]] = 1
-                # priv_o[D * 1 + self.rules.N_RANKS + element[0,1]] = 1
-                priv_o[D * 2 + element[2, 0]] = 1
-                # priv_o[D * 2 + self.rules.N_RANKS + element[0,1]] = 1
-                priv_o[D * 3 + element[3, 0]] = 1
-                # priv_o[D * 3 + self.rules.N_RANKS + element[0,1]] = 1
-
-                lut[range_idx] = priv_o
-
-        print(f"time elapsed for get_range_idx_to_private_obs_LUT PLO {time.process_time() - start}")
-
-        return lut
-
-    def get_1d_card_2_2d_card_LUT(self):
-        lut = np.full(shape=(self.rules.N_CARDS_IN_DECK, 2), fill_value=-2, dtype=np.int8)
-        for c in range(self.rules.N_CARDS_IN_DECK):
-            lut[c] = self.cpp_backend.get_2d_card(c)
-        return lut
-
-    def get_2d_card_2_1d_card_LUT(self):
-        lut = np.full(shape=(self.rules.N_RANKS, self.rules.N_SUITS), fill_value=-2, dtype=np.int8)
-        for r in range(self.rules.N_RANKS):
-            for s in range(self.rules.N_SUITS):
-                lut[r, s] = self.cpp_backend.get_1d_card(card_2d=np.array([r, s], dtype=np.int8))
-        return lut
-
     def get_idx_2_hole_card_LUT(self):
-        # create np array of card indexes
-        indexes = np.arange(0, 52)
-        # declare an array for all combibations
-        dt = np.dtype([('', indexes.dtype)] * 4)
-        # fill array right from combinations() func iteratively - its faster!
-        b = np.fromiter(itertools.combinations(indexes, 4), dt)
-        # finally reshape it and return
-        lut = b.view(indexes.dtype).reshape(-1, 4)
+        # [range_idx] --> sorted 4 cards, in itertools.combinations order. int8 like in Holdem, cards are <= 51
+        lut = np.empty(shape=(self.rules.RANGE_SIZE, self.rules.N_HOLE_CARDS), dtype=np.int8)
+        _fill_plo_idx_2_hole_card(self.rules.N_CARDS_IN_DECK, lut)
         return lut
 
     def get_hole_card_2_idx_LUT(self):
-        # constructs a LUT which is 4-d array of 52,
-        # used with plo 4-card hand (sorted card indexes) returns 1-NUMBER idx of hand
-        # reversed version of previous LUT
+        # a dense 4-d array of 52 would take 28 MB and only 0.4% of it would hold valid hands,
+        # so instead we rank the sorted hand combinatorially with _plo_hole_cards_2_idx.
+        # lut[c, i] --> C(N_CARDS_IN_DECK - 1 - c, N_HOLE_CARDS - i) for the card c at sorted position i
         cmax = self.rules.N_CARDS_IN_DECK
-        lut = np.full(shape=(cmax, cmax,
-                             cmax, cmax), fill_value=-2,
-                      dtype=np.int32)
-        n = 0
-        for i1 in range(cmax):
-            for i2 in range(i1 + 1, cmax):
-                for i3 in range(i2 + 1, cmax):
-                    for i4 in range(i3 + 1, cmax):
-                        lut[i1, i2, i3, i4] = n
-                        n += 1
+        lut = np.array([[comb(N=cmax - 1 - c, k=self.rules.N_HOLE_CARDS - i, exact=True)
+                         for i in range(self.rules.N_HOLE_CARDS)]
+                        for c in range(cmax)], dtype=np.int32)
         return lut
 
-    def get_card_in_what_range_idxs_LUT(self):
-        # now fast with numpy, still no idea why we need it
-        # also 20825 is a magic constant, got it empirically for PLO 4 cards
-        lut = np.full(shape=(self.rules.N_CARDS_IN_DECK, 20825), fill_value=-2,
-                      dtype=np.int32)
-        _idx2hc_lut = self.get_idx_2_hole_card_LUT()
-
-        for c in range(self.rules.N_CARDS_IN_DECK):
-            items = np.where(c == _idx2hc_lut)
-            lut[c,] = items[0]
-
-        assert not np.any(lut == -2)
-        return lut
+    def get_array_lut_specs(self):
+        specs = super().get_array_lut_specs()
+        specs["LUT_HOLE_CARDS_2_IDX"] = ((self.rules.N_CARDS_IN_DECK, self.rules.N_HOLE_CARDS), np.int32)
+        return specs
+
+
+# Array LUTs are also stored on disk, so that they only have to be built once per machine.
+# Bump the version whenever the content of a LUT changes.
+_LUT_DISK_CACHE_VERSION = 4
+_LUT_DISK_CACHE_DIR = ospj("C:\\data_cfr\\" if os.name == 'nt' else os.path.expanduser('~/'), "PokerRL_LUTs")
+# Set this environment variable to store the LUTs in another directory, or to an empty string to turn the disk cache off
+_LUT_DISK_CACHE_DIR_ENV_VAR = "POKERRL_LUT_DIR"
+_ARRAY_LUT_NAMES = (
+    "LUT_1DCARD_2_2DCARD",
+    "LUT_2DCARD_2_1DCARD",
+    "LUT_RANGE_IDX_TO_PRIVATE_OBS",
+    "LUT_RANGE_IDX_TO_PRIVATE_OBS_PF",
+    "LUT_IDX_2_HOLE_CARDS",
+    "LUT_HOLE_CARDS_2_IDX",
+    "LUT_CARD_IN_WHAT_RANGE_IDXS",
+)
+
+# (lut getter cls, rules cls) --> dict of all LUTs of a _LutHolderBase. LUTs are pure functions of the rules, so all
+# LutHolders of a game share them instead of each env rebuilding them. The arrays are read-only for that reason.
+_LUT_CACHE = {}
 
 
 class _LutHolderBase:
@@ -315,32 +367,154 @@ class _LutHolderBase:
     def __init__(self, lut_getter):
         self._lut_getter = lut_getter
 
+        cache_key = (type(lut_getter), lut_getter.rules)
+        if cache_key not in _LUT_CACHE:
+            _LUT_CACHE[cache_key] = self._build_luts()
+        self._luts = _LUT_CACHE[cache_key]
+
+        # the tiny DICT_LUTs can't be made read-only, so every holder gets its own copy of them
+        self.__dict__.update({name: dict(lut) if isinstance(lut, dict) else lut
+                              for name, lut in self._luts.items() if not name.endswith("_F32")})
+
+    @property
+    def LUT_RANGE_IDX_TO_PRIVATE_OBS_F32(self):
+        """ float32 copy of LUT_RANGE_IDX_TO_PRIVATE_OBS, created on first access and shared like the LUTs """
+        return self._get_f32_lut("LUT_RANGE_IDX_TO_PRIVATE_OBS")
+
+    @property
+    def LUT_RANGE_IDX_TO_PRIVATE_OBS_PF_F32(self):
+        """ float32 copy of LUT_RANGE_IDX_TO_PRIVATE_OBS_PF, created on first access and shared like the LUTs """
+        return self._get_f32_lut("LUT_RANGE_IDX_TO_PRIVATE_OBS_PF")
+
+    def _get_f32_lut(self, name):
+        f32_name = name + "_F32"
+        if f32_name not in self._luts:
+            lut = self._luts[name].astype(np.float32)
+            lut.setflags(write=False)
+            self._luts[f32_name] = lut
+        return self._luts[f32_name]
+
+    def _build_luts(self):
+        path = self._cache_path()
+        luts = None if path is None else self._load_array_luts(path, self._lut_getter.get_array_lut_specs())
+        if luts is None:
+            luts = self._build_array_luts()
+            if path is not None:
+                self._save_array_luts(path, luts)
+
+        # shared by all holders of the game, and get_1d_hole_cards_from_range_idx returns views into them
+        for lut in luts.values():
+            lut.setflags(write=False)
+
+        # [round] -> number of possible public boards in that round
+        luts["DICT_LUT_N_BOARDS"] = self._lut_getter.get_n_boards_LUT()
+
+        # [round] -> number of cards that have been dealt until (including) the round
+        luts["DICT_LUT_N_CARDS_OUT"] = self._lut_getter.get_n_cards_out_at_LUT()
+
+        # [round] -> number of cards that are dealt in the transition to round
+        luts["DICT_LUT_CARDS_DEALT_IN_TRANSITION_TO"] = self._lut_getter.get_n_cards_dealt_in_transition_to_LUT()
+
+        # [round] -> number of possible branches when board is dealt GOING INTO round
+        luts["DICT_LUT_N_BOARD_BRANCHES"] = self._lut_getter.get_n_board_branches_LUT()
+
+        # np.ndarray versions of the DICT_LUTs, for looking up many rounds at once or from numba code.
+        # For a single python int round, the dicts are faster.
+        for name in ("N_BOARDS", "N_CARDS_OUT", "CARDS_DEALT_IN_TRANSITION_TO", "N_BOARD_BRANCHES"):
+            luts["ARR_LUT_" + name] = self._dict_lut_to_arr(luts["DICT_LUT_" + name])
+            luts["ARR_LUT_" + name].setflags(write=False)
+
+        return luts
+
+    @staticmethod
+    def _dict_lut_to_arr(dict_lut):
+        arr = np.zeros(shape=max(dict_lut.keys()) + 1, dtype=np.int64)
+        for r, v in dict_lut.items():
+            arr[r] = v
+        return arr
+
+    def _build_array_luts(self):
+        luts = {}
+
         # lut[i, 0] --> rank; lut[i, 1] --> suit
-        self.LUT_1DCARD_2_2DCARD = self._lut_getter.get_1d_card_2_2d_card_LUT()
+        luts["LUT_1DCARD_2_2DCARD"] = self._lut_getter.get_1d_card_2_2d_card_LUT()
         # lut[rank, suit] --> int
-        self.LUT_2DCARD_2_1DCARD = self._lut_getter.get_2d_card_2_1d_card_LUT()
+        luts["LUT_2DCARD_2_1DCARD"] = self._lut_getter.get_2d_card_2_1d_card_LUT()
         # lut[range_idx] -> array of size   n_hole_cards * (n_suits + n_ranks)
-        self.LUT_RANGE_IDX_TO_PRIVATE_OBS = self._lut_getter.get_range_idx_to_private_obs_LUT()
-        self.LUT_RANGE_IDX_TO_PRIVATE_OBS_PF = self._lut_getter. \
-            get_range_idx_to_private_obs_LUT(preflop_suit_bucketing=True)
+        luts["LUT_RANGE_IDX_TO_PRIVATE_OBS"], luts["LUT_RANGE_IDX_TO_PRIVATE_OBS_PF"] = \
+            self._lut_getter.get_range_idx_to_private_obs_LUTs()
 
-        self.LUT_IDX_2_HOLE_CARDS = self._lut_getter.get_idx_2_hole_card_LUT()
-        self.LUT_HOLE_CARDS_2_IDX = self._lut_getter.get_hole_card_2_idx_LUT()
+        luts["LUT_IDX_2_HOLE_CARDS"] = self._lut_getter.get_idx_2_hole_card_LUT()
+        # PLO: not a dense LUT but the table that get_range_idx_from_hole_cards ranks hands with
+        luts["LUT_HOLE_CARDS_2_IDX"] = self._lut_getter.get_hole_card_2_idx_LUT()
 
         # [c] --> list of all range idxs that contain this card.
-        self.LUT_CARD_IN_WHAT_RANGE_IDXS = self._lut_getter.get_card_in_what_range_idxs_LUT()
+        luts["LUT_CARD_IN_WHAT_RANGE_IDXS"] = self._lut_getter.get_card_in_what_range_idxs_LUT()
 
-        # [round] -> number of possible public boards in that round
-        self.DICT_LUT_N_BOARDS = self._lut_getter.get_n_boards_LUT()
+        return luts
 
-        # [round] -> number of cards that have been dealt until (including) the round
-        self.DICT_LUT_N_CARDS_OUT = self._lut_getter.get_n_cards_out_at_LUT()
+    def _cache_path(self):
+        """
+        Returns:
+            str: directory the array LUTs of this game are stored in. Named by a hash of everything they depend on.
+            None if the disk cache is turned off.
+        """
+        cache_dir = os.environ.get(_LUT_DISK_CACHE_DIR_ENV_VAR, _LUT_DISK_CACHE_DIR)
+        if not cache_dir:
+            return None
+
+        rules = self._lut_getter.rules
+        key = (_LUT_DISK_CACHE_VERSION, type(self._lut_getter).__name__,
+               rules.N_HOLE_CARDS, rules.N_RANKS, rules.N_SUITS, rules.N_CARDS_IN_DECK, rules.RANGE_SIZE,
+               rules.SUITS_MATTER)
+        return ospj(cache_dir, hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest())
+
+    @staticmethod
+    def _load_array_luts(path, specs):
+        """
+        Memory-maps the LUTs read-only, so processes on the same machine share the physical pages.
+        Returns plain ndarray views, np.memmap makes every indexing into the LUTs about 2x slower.
 
-        # [round] -> number of cards that are dealt in the transition to round
-        self.DICT_LUT_CARDS_DEALT_IN_TRANSITION_TO = self._lut_getter.get_n_cards_dealt_in_transition_to_LUT()
+        Args:
+            path (str):     directory of the LUTs
+            specs (dict):   name --> (shape, dtype) every LUT has to match, see _LutGetterBase.get_array_lut_specs
 
-        # [round] -> number of possible branches when board is dealt GOING INTO round
-        self.DICT_LUT_N_BOARD_BRANCHES = self._lut_getter.get_n_board_branches_LUT()
+        Returns:
+            dict or None: None if not all LUTs are on disk or any of them doesn't match its spec
+        """
+        files = {name: ospj(path, name + ".npy") for name in _ARRAY_LUT_NAMES}
+        if not all(os.path.isfile(f) for f in files.values()):
+            return None
+
+        luts = {}
+        for name, f in files.items():
+            try:
+                lut = np.load(f, mmap_mode='r').view(np.ndarray)
+            except (OSError, ValueError):
+                return None  # truncated or otherwise corrupt file
+            shape, dtype = specs[name]
+            if lut.shape != shape or lut.dtype != np.dtype(dtype):
+                return None  # stale, e.g. written by another version of the LUT code
+            luts[name] = lut
+        return luts
+
+    @staticmethod
+    def _save_array_luts(path, luts):
+        tmp_file = None
+        try:
+            file_util.create_dir_if_not_exist(path)
+            for name, lut in luts.items():
+                # write to a tmp file first so that concurrent workers never load a half written LUT
+                tmp_file = ospj(path, name + "." + str(os.getpid()) + ".tmp.npy")
+                np.save(tmp_file, lut)
+                os.replace(tmp_file, ospj(path, name + ".npy"))
+        except OSError:
+            # caching is only an optimization, just don't leave a partial file behind
+            if tmp_file is not None and os.path.isfile(tmp_file):
+                try:
+                    os.remove(tmp_file)
+                except OSError:
+                    pass
 
     def get_1d_card(self, card_2d):
         """
@@ -366,11 +540,12 @@ class _LutHolderBase:
         if len(cards_2d.shape) == 0 or cards_2d.shape[0] == 0:
             return np.array([], dtype=np.int8)
 
-        aa = np.copy(cards_2d)
-        aa[aa == Poker.CARD_NOT_DEALT_TOKEN_1D] = 0  # for robustness against not-dealt tokens
-        return np.where(cards_2d[:, 0] == Poker.CARD_NOT_DEALT_TOKEN_1D,  # not dealt
-                        Poker.CARD_NOT_DEALT_TOKEN_1D,
-                        self.LUT_2DCARD_2_1DCARD[aa[:, 0], aa[:, 1]])
+        not_dealt = cards_2d[:, 0] == Poker.CARD_NOT_DEALT_TOKEN_1D
+        # look up not-dealt tokens as card 0 for robustness, then overwrite them in the (fresh) result
+        cards_1d = self.LUT_2DCARD_2_1DCARD[np.where(not_dealt, 0, cards_2d[:, 0]),
+                                            np.where(not_dealt, 0, cards_2d[:, 1])]
+        cards_1d[not_dealt] = Poker.CARD_NOT_DEALT_TOKEN_1D
+        return cards_1d
 
     def get_2d_cards(self, cards_1d):
         """
@@ -384,20 +559,37 @@ class _LutHolderBase:
         if len(cards_1d.shape) == 0 or cards_1d.shape[0] == 0:
             return np.array([], dtype=np.int8)
 
-        aa = np.copy(cards_1d)
-        aa[aa == Poker.CARD_NOT_DEALT_TOKEN_1D] = 0  # for robustness against not-dealt tokens
-        cards_2d = np.copy(self.LUT_1DCARD_2_2DCARD[aa]).reshape(-1, 2)
-        cards_2d[np.where(cards_1d == Poker.CARD_NOT_DEALT_TOKEN_1D)] = Poker.CARD_NOT_DEALT_TOKEN_2D.reshape(2)
+        not_dealt = cards_1d == Poker.CARD_NOT_DEALT_TOKEN_1D
+        # look up not-dealt tokens as card 0 for robustness, then overwrite them in the (fresh) result
+        cards_2d = self.LUT_1DCARD_2_2DCARD[np.where(not_dealt, 0, cards_1d)].reshape(-1, 2)
+        cards_2d[not_dealt] = Poker.CARD_NOT_DEALT_TOKEN_1D
         return cards_2d
 
     def get_range_idx_from_hole_cards(self, hole_cards_2d):
         raise NotImplementedError
 
     def get_2d_hole_cards_from_range_idx(self, range_idx):
-        raise NotImplementedError
+        """
+        Args:
+            range_idx (int):
 
-    def get_1d_hole_cards_from_range_idx(self, range_idx):
-        raise NotImplementedError
+        Returns:
+            np.ndarray(shape=[N_HOLE_CARDS, 2], dtype=np.int8): [[rank, suit], ...] of the hand
+        """
+        return self.LUT_1DCARD_2_2DCARD[self.LUT_IDX_2_HOLE_CARDS[range_idx]]
+
+    def get_1d_hole_cards_from_range_idx(self, range_idx, copy=False):
+        """
+        Args:
+            range_idx (int):
+            copy (bool):        if False, a read-only view into LUT_IDX_2_HOLE_CARDS is returned
+
+        Returns:
+            np.ndarray(shape=N_HOLE_CARDS): 1d hole cards of the hand
+        """
+        if copy:
+            return np.copy(self.LUT_IDX_2_HOLE_CARDS[range_idx])
+        return self.LUT_IDX_2_HOLE_CARDS[range_idx]
 
 
 class LutHolderLeduc(_LutHolderBase):
@@ -412,13 +604,6 @@ class LutHolderLeduc(_LutHolderBase):
         c1 = self.get_1d_cards(hole_cards_2d)[0]
         return self.LUT_HOLE_CARDS_2_IDX[c1, 0]
 
-    def get_2d_hole_cards_from_range_idx(self, range_idx):
-        c1 = self.LUT_IDX_2_HOLE_CARDS[range_idx, 0]
-        return np.array([self.LUT_1DCARD_2_2DCARD[c1]], dtype=np.int8)
-
-    def get_1d_hole_cards_from_range_idx(self, range_idx):
-        return np.copy(self.LUT_IDX_2_HOLE_CARDS[range_idx])
-
 
 class LutHolderHoldem(_LutHolderBase):
 
@@ -435,39 +620,14 @@ class LutHolderHoldem(_LutHolderBase):
 
         return self.LUT_HOLE_CARDS_2_IDX[c1, c2]
 
-    def get_2d_hole_cards_from_range_idx(self, range_idx):
-        c1 = self.LUT_IDX_2_HOLE_CARDS[range_idx, 0]
-        c2 = self.LUT_IDX_2_HOLE_CARDS[range_idx, 1]
-
-        return np.array([self.LUT_1DCARD_2_2DCARD[c1], self.LUT_1DCARD_2_2DCARD[c2]], dtype=np.int8)
-
-    def get_1d_hole_cards_from_range_idx(self, range_idx):
-        return np.copy(self.LUT_IDX_2_HOLE_CARDS[range_idx])
-
 
 class LutHolderPLO(_LutHolderBase):
 
     def __init__(self, env_cls):
         super().__init__(lut_getter=_LutGetterPLO(env_cls=env_cls))
+        self._range_size = env_cls.RULES.RANGE_SIZE
 
     def get_range_idx_from_hole_cards(self, hole_cards_2d):
-        list = []
-        # sort it, cuz our array is sorted too
-        for c in hole_cards_2d:
-            list.append(self.LUT_2DCARD_2_1DCARD[c[0]][c[1]])
-        list.sort()
-        hc = self.LUT_HOLE_CARDS_2_IDX[list[0], list[1], list[2], list[3]]
-
-        return hc
-
-    def get_2d_hole_cards_from_range_idx(self, range_idx):
-        c1 = self.LUT_IDX_2_HOLE_CARDS[range_idx, 0]
-        c2 = self.LUT_IDX_2_HOLE_CARDS[range_idx, 1]
-        c3 = self.LUT_IDX_2_HOLE_CARDS[range_idx, 2]
-        c4 = self.LUT_IDX_2_HOLE_CARDS[range_idx, 3]
-        hc_2d = np.array([self.LUT_1DCARD_2_2DCARD[c1], self.LUT_1DCARD_2_2DCARD[c2],
-                          self.LUT_1DCARD_2_2DCARD[c3], self.LUT_1DCARD_2_2DCARD[c4]], dtype=np.int8)
-        return hc_2d
-
-    def get_1d_hole_cards_from_range_idx(self, range_idx):
-        return np.copy(self.LUT_IDX_2_HOLE_CARDS[range_idx])
+        # the jitted ranker only takes arrays
+        return _plo_range_idx(np.asarray(hole_cards_2d), self.LUT_2DCARD_2_1DCARD, self._range_size,
+                              self.LUT_HOLE_CARDS_2_IDX)
@@ -62,11 +62,11 @@ class MainPokerModuleFLAT(nn.Module):
             self.final_fc_1 = nn.Linear(in_features=self.env_bldr.complete_obs_size, out_features=mpm_args.other_units)
             self.final_fc_2 = nn.Linear(in_features=mpm_args.other_units, out_features=mpm_args.other_units)
 
-        self.lut_range_idx_2_priv_o = torch.from_numpy(self.env_bldr.lut_holder.LUT_RANGE_IDX_TO_PRIVATE_OBS)
-        self.lut_range_idx_2_priv_o = self.lut_range_idx_2_priv_o.to(device=self.device, dtype=torch.float32)
+        self.lut_range_idx_2_priv_o = torch.tensor(self.env_bldr.lut_holder.LUT_RANGE_IDX_TO_PRIVATE_OBS,
+                                                   dtype=torch.float32, device=self.device)
 
-        self.lut_range_idx_2_priv_o_pf = torch.from_numpy(self.env_bldr.lut_holder.LUT_RANGE_IDX_TO_PRIVATE_OBS_PF)
-        self.lut_range_idx_2_priv_o_pf = self.lut_range_idx_2_priv_o_pf.to(device=self.device, dtype=torch.float32)
+        self.lut_range_idx_2_priv_o_pf = torch.tensor(self.env_bldr.lut_holder.LUT_RANGE_IDX_TO_PRIVATE_OBS_PF,
+                                                      dtype=torch.float32, device=self.device)
 
         self.to(device)
 
@@ -79,8 +79,8 @@ class MainPokerModuleRNN(nn.Module):
                 bidirectional=False,
                 batch_first=False
             )
-        self.lut_range_idx_2_priv_o = torch.from_numpy(self.env_bldr.lut_holder.LUT_RANGE_IDX_TO_PRIVATE_OBS)
-        self.lut_range_idx_2_priv_o = self.lut_range_idx_2_priv_o.to(device=self.device, dtype=torch.float32)
+        self.lut_range_idx_2_priv_o = torch.tensor(self.env_bldr.lut_holder.LUT_RANGE_IDX_TO_PRIVATE_OBS,
+                                                   dtype=torch.float32, device=self.device)
 
         self.to(device)
 
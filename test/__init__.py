@@ -1 +1,9 @@
+import atexit
+import os
+import shutil
+import tempfile
 
+# LutHolders cache their LUTs on disk. Keep the tests' cache out of the home directory.
+_lut_dir = tempfile.mkdtemp(prefix="PokerRL_LUTs_")
+os.environ["POKERRL_LUT_DIR"] = _lut_dir
+atexit.register(shutil.rmtree, _lut_dir, ignore_errors=True)
@@ -1,14 +1,31 @@
 # Copyright (c) 2019 Eric Steinberger
 
 
+import itertools
+import os
+import tempfile
 import unittest
-from unittest import TestCase
+from unittest import TestCase, mock
 
 import numpy as np
 
 from PokerRL.game.Poker import Poker
-from PokerRL.game._.look_up_table import LutHolderHoldem, _LutGetterHoldem, _LutGetterLeduc
-from PokerRL.game.games import StandardLeduc, DiscretizedNLHoldem
+from PokerRL.game._.look_up_table import LutHolderHoldem, _LutGetterHoldem, _LutGetterLeduc, _LutGetterPLO, \
+    _plo_hole_cards_2_idx, _ARRAY_LUT_NAMES, _LUT_CACHE, _LUT_DISK_CACHE_DIR_ENV_VAR
+from PokerRL.game.games import StandardLeduc, DiscretizedNLHoldem, PLO
+
+# test/__init__.py already does this, but not when this file is run directly
+_LUT_DIR = tempfile.TemporaryDirectory()
+_LUT_DIR_ENV = mock.patch.dict(os.environ, {_LUT_DISK_CACHE_DIR_ENV_VAR: _LUT_DIR.name})
+
+
+def setUpModule():
+    _LUT_DIR_ENV.start()
+
+
+def tearDownModule():
+    _LUT_DIR_ENV.stop()
+    _LUT_DIR.cleanup()
 
 
 class TestLutGetterHoldem(TestCase):
@@ -17,13 +34,18 @@ class TestLutGetterHoldem(TestCase):
         lg = _LutGetterHoldem(env_cls=DiscretizedNLHoldem)
         lut = lg.get_1d_card_2_2d_card_LUT()
         assert lut.shape == (52, 2)
-        assert not np.any(lut == -2)
+        assert lut.dtype == np.dtype(np.int8)
+        for c in range(52):
+            assert np.array_equal(lut[c], lg.cpp_backend.get_2d_card(c))
 
     def test_get_2d_card_2_1d_card_lut(self):
         lg = _LutGetterHoldem(env_cls=DiscretizedNLHoldem)
         lut = lg.get_2d_card_2_1d_card_LUT()
         assert lut.shape == (13, 4)
-        assert not np.any(lut == -2)
+        assert lut.dtype == np.dtype(np.int8)
+        for r in range(13):
+            for s in range(4):
+                assert lut[r, s] == lg.cpp_backend.get_1d_card(card_2d=np.array([r, s], dtype=np.int8))
 
     def test_get_idx_2_hole_card_lut(self):
         lg = _LutGetterHoldem(env_cls=DiscretizedNLHoldem)
@@ -96,6 +118,61 @@ class TestLutGetterLeduc(TestCase):
 
         assert np.all(counts == 1)
 
+
+class TestLutGetterPLO(TestCase):
+
+    def test_get_hole_card_2_idx_lut(self):
+        lg = _LutGetterPLO(env_cls=PLO)
+        lut = lg.get_hole_card_2_idx_LUT()
+        hc = lg.get_idx_2_hole_card_LUT()
+        assert lut.shape == (52, 4)
+        for range_idx in range(0, 270725, 997):
+            c1, c2, c3, c4 = hc[range_idx]
+            assert _plo_hole_cards_2_idx(c1, c2, c3, c4, 270725, lut) == range_idx
+
+    def test_get_lut_card_in_what_range_idxs(self):
+        lg = _LutGetterPLO(env_cls=PLO)
+        lut = lg.get_card_in_what_range_idxs_LUT()
+        hc = lg.get_idx_2_hole_card_LUT()
+        assert lut.shape == (52, 20825)
+
+        counts = np.bincount(lut.ravel(), minlength=270725)
+        assert np.all(counts == 4)
+
+        for c in range(52):
+            assert np.all(np.any(hc[lut[c]] == c, axis=1))
+
+    def test_get_lut_card_in_what_range_idxs_invalid_hole_cards(self):
+        lg = _LutGetterPLO(env_cls=PLO)
+        hc = lg.get_idx_2_hole_card_LUT()
+        out_of_range = hc.copy()
+        out_of_range[0, 0] = 52
+        duplicate = hc.copy()
+        duplicate[0, 1] = duplicate[0, 0]
+
+        for bad_hc in (out_of_range, duplicate):
+            with mock.patch.object(lg, "get_idx_2_hole_card_LUT", return_value=bad_hc):
+                with self.assertRaises(ValueError):
+                    lg.get_card_in_what_range_idxs_LUT()
+
+    def test_get_range_idx_to_private_obs_lut(self):
+        lg = _LutGetterPLO(env_cls=PLO)
+        lut = lg.get_range_idx_to_private_obs_LUT()
+        assert lut.shape == (270725, 4 * 17)
+        assert np.all(lut.reshape(-1, 4, 17)[:, :, :13].sum(axis=2) == 1)  # one rank per card
+        assert np.all(lut.reshape(-1, 4, 17)[:, :, 13:].sum(axis=2) == 1)  # one suit per card
+
+        lut_pf = lg.get_range_idx_to_private_obs_LUT(preflop_suit_bucketing=True)
+        assert np.array_equal(lut_pf.reshape(-1, 4, 17)[:, :, :13], lut.reshape(-1, 4, 17)[:, :, :13])
+        assert not np.any(lut_pf.reshape(-1, 4, 17)[:, :, 13:])
+
+    def test_get_range_idx_to_private_obs_luts(self):
+        lg = _LutGetterPLO(env_cls=PLO)
+        lut, lut_pf = lg.get_range_idx_to_private_obs_LUTs()
+        assert np.array_equal(lut, lg.get_range_idx_to_private_obs_LUT())
+        assert np.array_equal(lut_pf, lg.get_range_idx_to_private_obs_LUT(preflop_suit_bucketing=True))
+
+
 class TestLutHolderHoldem(TestCase):
 
     def test_create(self):
@@ -105,6 +182,18 @@ class TestLutHolderHoldem(TestCase):
         assert lh.LUT_2DCARD_2_1DCARD.dtype == np.dtype(np.int8)
         assert lh.LUT_IDX_2_HOLE_CARDS.dtype == np.dtype(np.int8)
         assert lh.LUT_HOLE_CARDS_2_IDX.dtype == np.dtype(np.int16)
+        assert lh.LUT_RANGE_IDX_TO_PRIVATE_OBS.dtype == np.dtype(np.uint8)
+        assert lh.LUT_RANGE_IDX_TO_PRIVATE_OBS_F32.dtype == np.dtype(np.float32)
+        assert np.array_equal(lh.LUT_RANGE_IDX_TO_PRIVATE_OBS_F32, lh.LUT_RANGE_IDX_TO_PRIVATE_OBS)
+
+    def test_arr_luts(self):
+        lh = DiscretizedNLHoldem.get_lut_holder()
+        for dict_lut, arr_lut in ((lh.DICT_LUT_N_BOARDS, lh.ARR_LUT_N_BOARDS),
+                                  (lh.DICT_LUT_N_CARDS_OUT, lh.ARR_LUT_N_CARDS_OUT),
+                                  (lh.DICT_LUT_CARDS_DEALT_IN_TRANSITION_TO, lh.ARR_LUT_CARDS_DEALT_IN_TRANSITION_TO),
+                                  (lh.DICT_LUT_N_BOARD_BRANCHES, lh.ARR_LUT_N_BOARD_BRANCHES)):
+            for r in DiscretizedNLHoldem.ALL_ROUNDS_LIST:
+                assert arr_lut[r] == dict_lut[r]
 
     def test_get_1d_card(self):
         lh = DiscretizedNLHoldem.get_lut_holder()
@@ -141,6 +230,13 @@ class TestLutHolderHoldem(TestCase):
 
                 n += 1
 
+    def test_get_1d_hole_cards_from_range_idx(self):
+        lh = DiscretizedNLHoldem.get_lut_holder()
+        assert not lh.get_1d_hole_cards_from_range_idx(5).flags.writeable
+        assert lh.get_1d_hole_cards_from_range_idx(5, copy=True).flags.writeable
+        assert np.array_equal(lh.get_1d_hole_cards_from_range_idx(5, copy=True),
+                              lh.get_1d_hole_cards_from_range_idx(5))
+
     def test_hole_card_luts(self):
         """ tests reversibility """
         lh = DiscretizedNLHoldem.get_lut_holder()
@@ -166,5 +262,141 @@ class TestLutHolderHoldem(TestCase):
                        lh.LUT_HOLE_CARDS_2_IDX[c1, c2]
 
 
+class TestLutHolderPLO(TestCase):
+
+    def test_create(self):
+        lh = PLO.get_lut_holder()
+
+        assert lh.LUT_1DCARD_2_2DCARD.dtype == np.dtype(np.int8)
+        assert lh.LUT_2DCARD_2_1DCARD.dtype == np.dtype(np.int8)
+        assert lh.LUT_IDX_2_HOLE_CARDS.dtype == np.dtype(np.int8)
+        assert lh.LUT_HOLE_CARDS_2_IDX.dtype == np.dtype(np.int32)
+        assert lh.LUT_RANGE_IDX_TO_PRIVATE_OBS.dtype == np.dtype(np.uint8)
+        assert lh.LUT_RANGE_IDX_TO_PRIVATE_OBS_PF.dtype == np.dtype(np.uint8)
+
+    def test_hole_card_luts(self):
+        """ tests reversibility """
+        lh = PLO.get_lut_holder()
+        for h in range(0, 270725, 997):
+            hole_cards_2d = lh.get_2d_hole_cards_from_range_idx(h)
+            assert lh.get_range_idx_from_hole_cards(hole_cards_2d) == h
+            assert lh.get_range_idx_from_hole_cards(hole_cards_2d[::-1]) == h
+
+    def test_get_range_idx_from_hole_cards_any_order(self):
+        lh = PLO.get_lut_holder()
+        for h in (0, 1, 12345, 270724):
+            hole_cards_2d = lh.get_2d_hole_cards_from_range_idx(h)
+            for perm in itertools.permutations(range(4)):
+                assert lh.get_range_idx_from_hole_cards(hole_cards_2d[list(perm)]) == h
+            assert lh.get_range_idx_from_hole_cards(hole_cards_2d.tolist()) == h
+
+    def test_get_range_idx_from_invalid_hole_cards(self):
+        lh = PLO.get_lut_holder()
+        hole_cards_2d = lh.get_2d_hole_cards_from_range_idx(12345).copy()
+
+        not_dealt = hole_cards_2d.copy()
+        not_dealt[3] = Poker.CARD_NOT_DEALT_TOKEN_2D
+        duplicate = hole_cards_2d.copy()
+        duplicate[3] = duplicate[0]
+        bad_rank = hole_cards_2d.copy()
+        bad_rank[3, 0] = PLO.RULES.N_RANKS
+        bad_suit = hole_cards_2d.copy()
+        bad_suit[3, 1] = PLO.RULES.N_SUITS
+
+        for cards in (not_dealt, duplicate, bad_rank, bad_suit, hole_cards_2d[:3], hole_cards_2d[:, :1]):
+            with self.assertRaises(ValueError):
+                lh.get_range_idx_from_hole_cards(cards)
+
+
+class TestLutHolderCache(TestCase):
+
+    def test_luts_are_shared(self):
+        lh = DiscretizedNLHoldem.get_lut_holder()
+        lh2 = DiscretizedNLHoldem.get_lut_holder()
+        assert lh.LUT_IDX_2_HOLE_CARDS is lh2.LUT_IDX_2_HOLE_CARDS
+        assert lh.LUT_RANGE_IDX_TO_PRIVATE_OBS is lh2.LUT_RANGE_IDX_TO_PRIVATE_OBS
+        assert lh.LUT_IDX_2_HOLE_CARDS is not StandardLeduc.get_lut_holder().LUT_IDX_2_HOLE_CARDS
+        assert lh.LUT_RANGE_IDX_TO_PRIVATE_OBS_F32 is lh2.LUT_RANGE_IDX_TO_PRIVATE_OBS_F32
+        assert lh.LUT_RANGE_IDX_TO_PRIVATE_OBS_PF_F32 is lh2.LUT_RANGE_IDX_TO_PRIVATE_OBS_PF_F32
+
+        # shared arrays are read-only, the small dicts are per holder
+        for name, lut in vars(lh).items():
+            if isinstance(lut, np.ndarray):
+                assert not lut.flags.writeable, name
+        assert not lh.LUT_RANGE_IDX_TO_PRIVATE_OBS_F32.flags.writeable
+        assert lh.DICT_LUT_N_BOARDS == lh2.DICT_LUT_N_BOARDS
+        assert lh.DICT_LUT_N_BOARDS is not lh2.DICT_LUT_N_BOARDS
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                mock.patch.dict(os.environ, {_LUT_DISK_CACHE_DIR_ENV_VAR: tmp_dir}), \
+                mock.patch.dict(_LUT_CACHE, clear=True):
+            lh = DiscretizedNLHoldem.get_lut_holder()
+            path = lh._cache_path()
+            assert path.startswith(tmp_dir)
+            for name in _ARRAY_LUT_NAMES:
+                assert os.path.isfile(os.path.join(path, name + ".npy"))
+            assert not any(f.endswith(".tmp.npy") for f in os.listdir(path))
+
+            luts = lh._load_array_luts(path, lh._lut_getter.get_array_lut_specs())
+            assert luts is not None
+            for name, lut in luts.items():
+                assert type(lut) is np.ndarray
+                assert lut.dtype == getattr(lh, name).dtype
+                assert np.array_equal(lut, getattr(lh, name))
+
+    def test_disk_cache_rejects_stale_luts(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                mock.patch.dict(os.environ, {_LUT_DISK_CACHE_DIR_ENV_VAR: tmp_dir}), \
+                mock.patch.dict(_LUT_CACHE, clear=True):
+            lh = DiscretizedNLHoldem.get_lut_holder()
+            path = lh._cache_path()
+            specs = lh._lut_getter.get_array_lut_specs()
+            f = os.path.join(path, "LUT_HOLE_CARDS_2_IDX.npy")
+
+            np.save(f, lh.LUT_HOLE_CARDS_2_IDX.astype(np.int32))
+            assert lh._load_array_luts(path, specs) is None
+            np.save(f, lh.LUT_HOLE_CARDS_2_IDX[:13])
+            assert lh._load_array_luts(path, specs) is None
+
+            # a new holder rebuilds the LUTs and overwrites the stale file
+            _LUT_CACHE.clear()
+            lh2 = DiscretizedNLHoldem.get_lut_holder()
+            assert lh2.LUT_HOLE_CARDS_2_IDX.dtype == np.dtype(np.int16)
+            assert np.array_equal(lh2.LUT_HOLE_CARDS_2_IDX, lh.LUT_HOLE_CARDS_2_IDX)
+            assert lh._load_array_luts(path, specs) is not None
+
+    def test_disk_cache_failed_write(self):
+        def _partial_save(file, arr):
+            with open(file, "wb") as f:
+                f.write(b"\x93NUMPY")
+            raise OSError("disk full")
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                mock.patch.dict(os.environ, {_LUT_DISK_CACHE_DIR_ENV_VAR: tmp_dir}), \
+                mock.patch.dict(_LUT_CACHE, clear=True), \
+                mock.patch("numpy.save", _partial_save):
+            lh = DiscretizedNLHoldem.get_lut_holder()
+            assert os.listdir(lh._cache_path()) == []
+
+    def test_disk_cache_off(self):
+        with mock.patch.dict(os.environ, {_LUT_DISK_CACHE_DIR_ENV_VAR: ""}), \
+                mock.patch.dict(_LUT_CACHE, clear=True), \
+                mock.patch.object(LutHolderHoldem, "_save_array_luts") as save:
+            lh = DiscretizedNLHoldem.get_lut_holder()
+            assert lh._cache_path() is None
+            assert lh.LUT_IDX_2_HOLE_CARDS.shape == (1326, 2)
+            save.assert_not_called()
+
+    def test_array_lut_specs(self):
+        for game in (StandardLeduc, DiscretizedNLHoldem, PLO):
+            lh = game.get_lut_holder()
+            specs = lh._lut_getter.get_array_lut_specs()
+            assert set(specs.keys()) == set(_ARRAY_LUT_NAMES)
+            for name, (shape, dtype) in specs.items():
+                assert getattr(lh, name).shape == shape
+                assert getattr(lh, name).dtype == np.dtype(dtype)
+
+
 if __name__ == '__main__':
     unittest.main()